@@ -33,19 +33,22 @@ import shlex
 import glob
 import locale
 from configparser import ConfigParser
-from typing import Generator, Union, Dict, Tuple, Set
+from typing import Generator, Union, Dict, Tuple
 
 from .log import log
 from .parse import *
-from .prerender import Prerenderer
-from .render import RENDERERS
 from .version import __version__
 
-# A type used for mapping a user-defined Lua module name to a set of paths (or glob
-# expressions).  The module name is split on '.' so the dict key is a tuple, but the
+# A type used for mapping a user-defined Lua module name to a tuple of unique paths (or
+# glob expressions).  The module name is split on '.' so the dict key is a tuple, but the
 # modulie name can also be None if the user didn't provide any explicit module name, in
 # which case the module name will be inferred.
-BasePathsType = Dict[Union[Tuple[str, ...], None], Set[str]]
+BasePathsType = Dict[Union[Tuple[str, ...], None], Tuple[str, ...]]
+
+# Default input encoding when none is configured.  Python already applies the user's
+# LC_CTYPE at startup, so there's no need to have getpreferredencoding() call
+# setlocale() again.
+PREFERRED_ENCODING = locale.getpreferredencoding(False)
 
 class FullHelpParser(argparse.ArgumentParser):
     def error(self, message: str) -> None:
@@ -86,39 +89,71 @@ def get_file_by_module(module, bases: BasePathsType) -> Union[str, None]:
             # Next check to see if the first component of the module name is
             # the same as the base directory name and if so strip it off and
             # look for remaining.  For example, we're loading foo.bar and base is
-            # ../foo, then we check ../foo/bar.lua
-            baseparts = os.path.split(base)
-            if modparts[0] == baseparts[-1]:
+            # ../foo, then we check ../foo/bar.lua.  Base paths are always absolute
+            # (and therefore normalized), so splitting on os.sep is sufficient.
+            if modparts[0] == base.rpartition(os.sep)[2]:
                 p = os.path.join(base, *modparts[1:]) + '.lua'
                 if os.path.exists(p):
                     return p
 
 
-def crawl(parser: Parser, path: str, follow: bool, seen: Set[str], bases: BasePathsType, encoding: str) -> None:
+class Crawler:
     """
-    Parses all Lua source files starting with the given path and recursively
-    crawling all files referenced in the code via 'require' statements.
+    Parses Lua source files and recursively crawls the files they reference via
+    'require' statements.
+
+    State that's invariant for the whole crawl (the parser, base search paths, and
+    encoding) along with the bookkeeping shared across recursions is held here, rather
+    than being passed through every level of recursion.
     """
-    if os.path.isdir(path):
-        # Passing a directory implies follow
-        follow = True
-        path = os.path.join(path, 'init.lua')
-        if not os.path.exists(path):
-            log.critical('directory given, but %s does not exist', path)
-            sys.exit(1)
-    path = os.path.abspath(path)
-    if path in seen:
-        return
-    seen.add(path)
-    log.info('parsing %s', path)
-    requires = parser.parse_source(open(path, encoding=encoding))
-    if follow:
-        for r in requires:
-            newpath = get_file_by_module(r, bases)
-            if not newpath:
-                log.error('could not discover source file for module %s', r)
-            else:
-                crawl(parser, newpath, follow, seen, bases, encoding)
+    def __init__(self, parser: Parser, bases: BasePathsType, encoding: str) -> None:
+        self.parser = parser
+        self.bases = bases
+        self.encoding = encoding
+        # Absolute paths of all files that have been parsed
+        self.seen: set[str] = set()
+        # Caches get_file_by_module() results, which is sound because bases doesn't
+        # change during the crawl.
+        #
+        # module name -> path or None
+        self.resolved: dict[str, str|None] = {}
+
+
+    def crawl(self, path: str, follow: bool) -> None:
+        """
+        Parses all Lua source files starting with the given path and recursively
+        crawling all files referenced in the code via 'require' statements if follow
+        is True.
+        """
+        if os.path.isdir(path):
+            # Passing a directory implies follow
+            follow = True
+            path = os.path.join(path, 'init.lua')
+            if not os.path.exists(path):
+                log.critical('directory given, but %s does not exist', path)
+                sys.exit(1)
+        path = os.path.abspath(path)
+        if path in self.seen:
+            return
+        self.seen.add(path)
+        log.info('parsing %s', path)
+        with open(path, encoding=self.encoding) as f:
+            requires = self.parser.parse_source(f)
+        if follow:
+            # The same module is commonly required more than once within a file, so
+            # dedupe before resolving.  A dict (rather than a set) preserves the order
+            # of first appearance, which keeps crawl order deterministic.
+            for r in dict.fromkeys(requires):
+                # The same modules tend to be required across many files, so only hit
+                # the filesystem once per module name.
+                if r in self.resolved:
+                    newpath = self.resolved[r]
+                else:
+                    newpath = self.resolved[r] = get_file_by_module(r, self.bases)
+                if not newpath:
+                    log.error('could not discover source file for module %s', r)
+                else:
+                    self.crawl(newpath, follow)
 
 
 def get_config(args: argparse.Namespace) -> ConfigParser:
@@ -163,7 +198,6 @@ def get_files(config: ConfigParser) -> Generator[Tuple[str, str], None, None]:
 
 def main():
     global config
-    renderer_names = ', '.join(RENDERERS)
     p = FullHelpParser(prog='luadox')
     p.add_argument('-c', '--config', type=str, metavar='FILE',
                    help='Luadox configuration file')
@@ -172,8 +206,8 @@ def main():
     p.add_argument('--hometext', action='store', type=str, metavar='TEXT',
                    help='Home link text on the top left of every page')
     p.add_argument('-r', '--renderer', action='store', type=str, metavar='TYPE',
-                   help=f'How to render the parsed content: {renderer_names} '
-                   '(default: html)')
+                   help='How to render the parsed content; an unknown type lists the '
+                   'valid ones (default: html)')
     p.add_argument('-o', '--out', action='store', type=str, metavar='PATH',
                    help='Target path for rendered files, with directories created '
                    'if necessary. For single-file renderers (e.g. json), this is '
@@ -189,12 +223,17 @@ def main():
     p.add_argument('--nofollow', action='store_true',
                    help="Disable following of require()'d files (default false)")
     p.add_argument('--encoding', action='store', type=str, metavar='CODEC', default=None,
-                   help='Character set codec for input (default {})'.format(locale.getpreferredencoding()))
+                   help='Character set codec for input (default {})'.format(PREFERRED_ENCODING))
     p.add_argument('files', type=str, metavar='[MODNAME=]FILE', nargs='*',
                    help='List of files to parse or directories to crawl with optional module name alias')
     p.add_argument('--version', action='version', version='%(prog)s ' + __version__)
 
     args = p.parse_args()
+    # Deferred until after argument parsing so --help and --version don't pay for
+    # importing the renderers.
+    from .prerender import Prerenderer
+    from .render import RENDERERS
+
     config = get_config(args)
     files = list(get_files(config))
     if not files:
@@ -206,29 +245,32 @@ def main():
     try:
         rendercls = RENDERERS[renderer]
     except KeyError:
-        log.error('unknown renderer "%s", valid types are: %s', renderer, renderer_names)
+        log.error('unknown renderer "%s", valid types are: %s', renderer, ', '.join(RENDERERS))
         sys.exit(1)
 
     # Derive a set of base paths based on the input files that will act as search
-    # paths for crawling
-    bases: BasePathsType = {}
+    # paths for crawling.  Paths are deduped with a dict to preserve the order they
+    # were given in, and then frozen into tuples as bases is read-only from here on.
+    basepaths: dict[tuple[str, ...]|None, dict[str, None]] = {}
     for alias, fname in files:
         fname = os.path.abspath(fname)
         aliasparts = tuple(alias.split('.')) if alias else None
-        paths = bases.setdefault(aliasparts, set())
-        paths.add(fname if os.path.isdir(fname) else os.path.dirname(fname))
+        paths = basepaths.setdefault(aliasparts, {})
+        paths[fname if os.path.isdir(fname) else os.path.dirname(fname)] = None
+    bases: BasePathsType = {k: tuple(v) for k, v in basepaths.items()}
 
     parser = Parser(config)
-    encoding = config.get('project', 'encoding', fallback=locale.getpreferredencoding())
+    encoding = config.get('project', 'encoding', fallback=PREFERRED_ENCODING)
     try:
         # Parse given files/directories, with following if enabled.
         follow = config.get('project', 'follow', fallback='true').lower() in ('true', '1', 'yes')
-        seen: set[str] = set()
+        crawler = Crawler(parser, bases, encoding)
         for _, fname in files:
-            crawl(parser, fname, follow, seen, bases, encoding)
+            crawler.crawl(fname, follow)
         pages = config.items('manual') if config.has_section('manual') else []
         for scope, path in pages:
-            parser.parse_manual(scope, open(path, encoding=encoding))
+            with open(path, encoding=encoding) as f:
+                parser.parse_manual(scope, f)
     except Exception as e:
         msg = f'error parsing around {parser.ctx.file}:{parser.ctx.line}: {e}'
         if isinstance(e, ParseError):
@@ -17,7 +17,7 @@ import sys
 import os
 import re
 from configparser import ConfigParser
-from typing import IO, Optional, Union, Tuple, List, Dict, Type, Match
+from typing import IO, Optional, Union, Tuple, List, Dict, Type, Match, Any
 
 from . import tags
 from .tags import TagParser, ParseError
@@ -36,6 +36,24 @@ COLLECTION_TAGS: Dict[Type[tags.CollectionTag], Type[Reference]] = {
     tags.TableTag: TableRef,
 }
 
+# Tags that parse_source() acts on immediately.  Anything else (e.g. @tparam or @usage)
+# is content, which is deferred to prerendering.  Content tags are the bulk of tags in
+# practice, so this lets them bypass the chain of checks for the tags handled here.
+PARSER_TAGS: Tuple[Type[tags.Tag], ...] = (
+    tags.CollectionTag, tags.WithinTag, tags.FieldTag, tags.AliasTag, tags.CompactTag,
+    tags.FullnamesTag, tags.MetaTag, tags.InheritsTag, tags.RenameTag, tags.ScopeTag,
+    tags.DisplayTag, tags.TypeTag, tags.OrderTag, tags.UnrecognizedTag,
+)
+
+# Parser tags that simply record a value in the ref's flags, mapping the tag class to
+# the flag name and the tag attribute holding the value.
+FLAG_TAGS: Dict[Type[tags.Tag], Tuple[str, str]] = {
+    tags.CompactTag: ('compact', 'elements'),
+    tags.MetaTag: ('meta', 'value'),
+    tags.InheritsTag: ('inherits', 'superclass'),
+    tags.TypeTag: ('type', 'types'),
+}
+
 class Context:
     """
     Keeps track of current file and line being processed.
@@ -43,6 +61,9 @@ class Context:
     There is a single instance held by Parser that's used throughout the program.
     """
     UNDEF = Sentinel.UNDEF
+    # ctx is read and updated for nearly every line and ref processed.
+    __slots__ = ('file', 'line', 'ref')
+
     def __init__(self):
         self.file: Optional[str] = None
         self.line: Optional[int] = None
@@ -81,6 +102,29 @@ class Parser:
     RE_TAG = re.compile(r'^ *@([^{]\S+) *(.*)')
     RE_COMMENTED_TAG = re.compile(r'^--+ *@([^{]\S+) *(.*)')
     RE_MANUAL_HEADING = re.compile(r'^(#+) *(.*) *')
+    # Used to derive section symbols from manual headings
+    RE_MANUAL_SYMBOL_INVALID = re.compile(r'[^a-zA-Z0-9- ]')
+    RE_MANUAL_SYMBOL_SPACES = re.compile(r' +')
+    # Comment blocks must begin with a triple dash.  The block may thereafter use
+    # either 2 or 3 dashes throughout.
+    RE_START_COMMENT_BLOCK = re.compile(r'^(---[^-]|---+$)')
+    RE_REQUIRE = re.compile(r'''\brequire\b *\(?['"]([^'"]+)['"]''')
+    # Function in the form "function foo(bar, baz)" or "foo = function(bar, baz)"
+    RE_FUNCTION = re.compile(
+        r'''(?:\bfunction *([^\s(]+)|(\S+) *= *function) *\(([^)]*)(\))?'''
+    )
+    # Continuation of a function signature spread across multiple lines
+    RE_FUNCTION_ARGS = re.compile(r'''([^)]*)(\))?''')
+    # Field in the form: [foo] = bar
+    RE_FIELD_BRACKET = re.compile(r'''\[([^]]+)\] *=''')
+    RE_FIELD = re.compile(r'''\b([\S\.]+) *=''')
+    RE_QUOTES = re.compile(r'''['"]''')
+    # References within content in the form `ref`, @{ref}, or @{ref|text}
+    RE_BACKTICK_REF = re.compile(r'(?<!`)`([^` ]+)`', re.S)
+    RE_REF = re.compile(r'(`)?@{([^}|]+)(?:\|([^}]*))?}(`)?', re.S)
+    # Normalizes names passed to resolve_ref(): Class:method becomes Class.method, and
+    # parens (e.g. from @{func()}) are dropped.
+    RESOLVE_NAME_TABLE = str.maketrans({':': '.', '(': None, ')': None})
 
     def __init__(self, config: ConfigParser) -> None:
         self.config = config
@@ -113,12 +157,42 @@ class Parser:
         #
         # topsym -> (name -> CollectionRef)
         self.collections: dict[str, dict[str, CollectionRef]] = {}
+        # Inverse of the above, used to find which topsyms define a collection of a
+        # given name (e.g. for @within) without visiting every topsym.
+        #
+        # collection name -> [topsym, ...]
+        self._collection_topsyms: dict[str, list[str]] = {}
+        # Collections registered above, keyed by their fully qualified name and then
+        # topsym.  Used by _add_reference() to detect name conflicts within a topsym, and
+        # by get_elements_in_collection() to find all topsyms with a given collection.
+        #
+        # name -> (topsym -> [CollectionRef, ...])
+        self._collections_by_name: dict[str, dict[str, list[CollectionRef]]] = {}
         # A dict of all Reference objects, keyed by fully qualified name.
         #
         # name -> Reference
         self.refs: dict[str, Reference] = {}
         # Maps refs by their ids, rather than names
         self.refs_by_id: dict[str, Reference] = {}
+        # Per-type indexes over self.parsed used by get_reference() and
+        # get_elements_in_collection().  These are built lazily on first use, which
+        # normally happens once parsing has completed and names are final, and are
+        # discarded whenever a new reference is added.
+        #
+        # type -> (name -> Reference)
+        self._parsed_by_name: dict[type, dict[str, Reference]] = {}
+        # Refs are grouped under both (collection name, topsym) and (collection name,
+        # None), the latter holding refs from all topsyms.
+        #
+        # type -> ((collection name, topsym or None) -> [Reference, ...])
+        self._parsed_by_collection: dict[type, dict[tuple[Optional[str], Optional[str]], list[Any]]] = {}
+        # Caches resolve_ref() results, keyed on the id of the context ref (as
+        # resolution is relative to it) and the name being resolved.  References are
+        # unhashable, but ids are stable as context refs are held by the parser for
+        # its lifetime.  Cleared whenever self.refs changes.
+        #
+        # (id(ctx.ref), name) -> Reference or None
+        self._resolve_cache: dict[tuple[int, str], Reference|None] = {}
 
         # This holds the context of the current file and reference being processed
         self.ctx = Context()
@@ -133,7 +207,8 @@ class Parser:
         n, line = next(self.feed, (None, None))
         self.ctx.update(line=n)
         if line is not None:
-            return n, strip_trailing_comment(line) if strip else line.strip()
+            line = line.strip()
+            return n, strip_trailing_comment(line) if strip else line
         else:
             return None, None
 
@@ -158,26 +233,28 @@ class Parser:
         the name and a list of arguments if found, or a 2-tuple of Nones if not
         found.
         """
-        # Form: function foo(bar, baz)
-        m = recache(r'''\bfunction *([^\s(]+) *\(([^)]*)(\))?''').search(line)
-        if not m:
-            # Look for form: foo = function(bar, baz)
-            m = recache(r'''(\S+) *= *function *\(([^)]*)(\))?''').search(line)
+        if 'function' not in line:
+            # Both forms below require the keyword, so don't bother with the regexps.
+            return None, None
+        m = self.RE_FUNCTION.search(line)
         if not m:
             # Not a function (or not one we could recognize at least)
             return None, None
-        name, argstr, terminated = m.groups()
-        arguments = [arg.strip() for arg in argstr.replace(' ', '').split(',') if arg.strip()]
+        name, assigned, argstr, terminated = m.groups()
+        name = name or assigned
+        # Argument names (self, opts, etc.) repeat across nearly every function, so
+        # intern them to avoid holding a separate copy per function.
+        arguments = [sys.intern(arg.strip()) for arg in argstr.replace(' ', '').split(',') if arg.strip()]
         while not terminated:
             # The function signature is spread across multiple lines
             n, nextline = self._next_line()
             if nextline is None:
                 log.error('%s:%s: function definition is truncated', self.ctx.file, n)
                 return None, None
-            m = recache(r'''([^)]*)(\))?''').search(nextline)
+            m = self.RE_FUNCTION_ARGS.search(nextline)
             if m:
                 argstr, terminated = m.groups()
-                arguments.extend([arg.strip() for arg in argstr.replace(' ', '').split(',') if arg.strip()])
+                arguments.extend([sys.intern(arg.strip()) for arg in argstr.replace(' ', '').split(',') if arg.strip()])
         return name, arguments
 
 
@@ -189,11 +266,14 @@ class Parser:
         A 2-tuple is returned to be consistent with other _parse_() functions,
         but the second return value is always None.
         """
+        if '=' not in line:
+            # Both forms below require an assignment.
+            return None, None
         # Fields in the form [foo] = bar
-        m = recache(r'''\[([^]]+)\] *=''').search(line)
+        m = self.RE_FIELD_BRACKET.search(line)
         if m:
-            return recache(r'''['"]''').sub('', m.group(1)), None
-        m = recache(r'''\b([\S\.]+) *=''').search(line)
+            return self.RE_QUOTES.sub('', m.group(1)), None
+        m = self.RE_FIELD.search(line)
         if m:
             return m.group(1), None
         else:
@@ -214,7 +294,7 @@ class Parser:
         assert(type(ref) != Reference)
         # Sanity check symbol is defined. It's a bug if it isn't.
         assert(ref.symbol)
-        if ref.userdata.get('added'):
+        if ref._added:
             # Reference was already added. This also indicates a bug, but it's not fatal
             # so just log the error.
             log.error('%s:%s: reference "%s" with the same name already exists', ref.file, ref.line, ref.name)
@@ -245,6 +325,7 @@ class Parser:
         # Register the collection against its top-level element.  Class and
         # module refs actually include themselves as a collection to simplify
         # get_collections(), but manual refs don't do this.
+        new_collection = False
         if isinstance(ref, CollectionRef) and not isinstance(ref, ManualRef):
             if ref.topsym not in self.collections:
                 self.collections[ref.topsym] = {}
@@ -254,6 +335,8 @@ class Parser:
             # reported in the conflict check below.
             if ref.symbol not in collections:
                 collections[ref.symbol] = ref
+                self._collection_topsyms.setdefault(ref.symbol, []).append(ref.topsym)
+                new_collection = True
 
         # For fields documented in class methods, strip the self prefix here.
         if isinstance(ref, FieldRef):
@@ -261,19 +344,21 @@ class Parser:
                 ref.symbol = ref.symbol[5:]
 
         self.parsed[type(ref)].append(ref)
-        ref.userdata['added'] = True
+        ref._added = True
+        self._parsed_by_name.clear()
+        self._parsed_by_collection.clear()
+        self._resolve_cache.clear()
 
         if ref.name in self.refs:
             conflict = None
             # Sections between topsyms can conflict in name, but if a section conflicts
             # with some other reference in the same topsym we should complain.
-            for sectref in self.collections[ref.topsym].values():
-                if sectref != ref and sectref.name == ref.name:
-                    conflict = sectref
-                    break
+            sectrefs = self._collections_by_name.get(ref.name, {}).get(ref.topsym)
+            if sectrefs:
+                conflict = sectrefs[0]
             if not conflict and not isinstance(ref, SectionRef):
                 conflict = self.refs[ref.name]
-            if conflict and conflict != ref:
+            if conflict and conflict is not ref:
                 log.error('%s:%s: %s "%s" conflicts with %s name at %s:%s',
                           ref.file, ref.line, ref.type, ref.name, conflict.type, conflict.file, conflict.line)
         else:
@@ -282,20 +367,24 @@ class Parser:
                 log.critical('collision in reference id for %s (%s), please report this as a bug.', ref.name, ref.id)
             else:
                 self.refs_by_id[ref.id] = ref
+        if new_collection:
+            assert(isinstance(ref, CollectionRef))
+            # Indexed only now that the name is final (computing it may apply @rename to
+            # the symbol, which mustn't happen before the collections dict is keyed).
+            self._collections_by_name.setdefault(ref.name, {}).setdefault(ref.topsym, []).append(ref)
 
     def _check_disconnected_reference(self, ref: Union[Reference, None]) -> bool:
         """
         Logs a warning if the reference is disconnected (that is, a documentation
         block that is not associated with any symbol).
         """
-        if ref and not ref.userdata.get('added'):
+        if ref and not ref._added:
             if ref.symbol:
                 return True
             # Potentially disconnected comment stanza here, but let's first check to see
             # if there's any text in the comments, otherwise a blank --- would warn
             # somewhat pointlessly.
-            content = ''.join(line.lstrip('-').strip() for (_, line, _) in ref.raw_content)
-            if content:
+            if any(line.lstrip('-').strip() for (_, line, _) in ref.raw_content):
                 log.warning('%s:%s: comment block is not connected with any section, ignoring', ref.file, ref.line)
         return False
 
@@ -311,13 +400,14 @@ class Parser:
         Returns a list of names that were require()d within the scanned file, which can
         be used by the caller for crawling.
         """
-        code = f.read()
         path = f.name if hasattr(f, 'name') else '<generated>'
 
         # TODO: preprocess all lines within --[[-- ... ]] comment block with --- prefixes
         # in order to support multi-line block comments.
-        code = [line.strip() for line in code.splitlines()]
-        self.feed = iter(enumerate(code, 1))
+        #
+        # Lines are read from the file and stripped by _next_line() as they're
+        # consumed, so the source is never held in memory all at once.
+        self.feed = enumerate(f, 1)
 
         # Current scope, 2-tuple of (type, name) where type can be class, module, or
         # table.  We initialize to the module name of the current file, but any @module or
@@ -330,16 +420,17 @@ class Parser:
         # Reference object for last section, defaulting to one for the module itself
         modref = ModuleRef(self.refs, file=path, line=1, symbol=modname, implicit=True, level=-1)
         scopes: list[Reference] = [modref]
+        # A shallow copy of scopes that's shared by all field and function refs created
+        # until scopes is next modified, so that subsequent modifications don't
+        # retroactively apply to those refs.  Reset to None whenever scopes changes.
+        # It's never modified, so it's a tuple, which is also more compact than a list.
+        scopes_snapshot: tuple[Reference, ...]|None = None
 
         # List of modules that were discovered via a 'require' statement in the given
         # Lua source file. This is returned, and the caller can then attempt to discover
         # the source file for the given module and call parse_source() on that.
         requires: list[str] = []
-        re_require = recache(r'''\brequire\b *\(?['"]([^'"]+)['"]''')
 
-        # Comment blocks must begin with a triple dash.  The block may thereafter use
-        # either 2 or 3 dashes throughout.
-        re_start_comment_block = recache(r'^(---[^-]|---+$)')
         # Whether we should try to discover field/function from the next line
         # of code.  Usually this will be True but e.g. if we encounter a
         # @class or @table tag, we don't want to treat it as a field.
@@ -351,12 +442,18 @@ class Parser:
         # Reference to the current collection, defaulting to implicit module ref
         collection = modref
         self.ctx.update(file=path)
+        # Bound methods used for every line are looked up once here rather than
+        # resolved through self on each iteration.
+        next_line = self._next_line
+        parse_tags = self.tag_parser.parse
+        # Code parsers to try in order for the line following a comment block.
+        code_parsers = ((FieldRef, self._parse_field), (FunctionRef, self._parse_function))
         while True:
-            n, line = self._next_line(strip=False)
+            n, line = next_line(strip=False)
             if n is None or line is None:
                 break
-            self.ctx.update(line=n)
-            if re_start_comment_block.search(line) and not ref:
+            # Note that _next_line() has already updated the context's line number.
+            if not ref and line.startswith('---') and self.RE_START_COMMENT_BLOCK.match(line):
                 # Starting a content block for something to be included in the docs.
                 # Create a new generic (unknown type) Reference against which we will
                 # accumulate all comments and other modifier tags.  As we continue parsing
@@ -374,15 +471,21 @@ class Parser:
                 # raw content for the ref and will be handled later during prerendering by
                 # parse_raw_content()
                 unprocessed_tags = []
-                for tag in self.tag_parser.parse(line, path, n):
-                    # Will decrement below if we don't end up handling this tag now.
+                for tag in parse_tags(line, path, n):
+                    if not isinstance(tag, PARSER_TAGS):
+                        unprocessed_tags.append(tag)
+                        continue
                     ntags += 1
+                    flag = FLAG_TAGS.get(type(tag))
+                    if flag:
+                        ref.flags[flag[0]] = getattr(tag, flag[1])
+                        continue
                     if isinstance(tag, tags.CollectionTag):
                         ref = COLLECTION_TAGS[type(tag)].clone_from(
                             ref, 
                             line=n,
                             scopes=scopes,
-                            symbol=tag.name,
+                            symbol=sys.intern(tag.name),
                             collection=collection,
                             level=table_level,
                         )
@@ -401,35 +504,35 @@ class Parser:
                         # References, but don't append to the current scopes list as
                         # that affects the scopes for the new class Reference.
                         scopes = [scopes[0], ref]
+                        scopes_snapshot = None
                         parse_next_code_line = False
                     elif isinstance(tag, tags.ModuleTag):
                         # As with class above, replace scopes list.
                         scopes = [scopes[0], ref]
+                        scopes_snapshot = None
                     elif isinstance(tag, tags.TableTag):
                         scopes.append(ref)
+                        scopes_snapshot = None
                         parse_next_code_line = False
                     elif isinstance(tag, tags.FieldTag):
                         # Inject a field type Reference with the given arguments.
-                        # Here we also make a shallow copy of the current scopes
+                        # Here we also use a shallow copy of the current scopes
                         # otherwise the popping below that occurs when the table
                         # concludes will end up modifying the scopes here after the
                         # fact.
+                        if scopes_snapshot is None:
+                            scopes_snapshot = tuple(scopes)
                         field = FieldRef(
-                            self.refs, file=path, line=n, scopes=scopes[:],
-                            symbol=tag.name, collection=collection
+                            self.refs, file=path, line=n, scopes=scopes_snapshot,
+                            symbol=sys.intern(tag.name), collection=collection
                         )
                         field.raw_content.append((n, tag.desc, []))
                         self._add_reference(field, modref)
                     elif isinstance(tag, tags.AliasTag):
                         self.refs[tag.name] = ref
-                    elif isinstance(tag, tags.CompactTag):
-                        ref.flags['compact'] = tag.elements
+                        self._resolve_cache.clear()
                     elif isinstance(tag, tags.FullnamesTag):
                         ref.flags['fullnames'] = True
-                    elif isinstance(tag, tags.MetaTag):
-                        ref.flags['meta'] = tag.value
-                    elif isinstance(tag, tags.InheritsTag):
-                        ref.flags['inherits'] = tag.superclass
                     elif isinstance(tag, tags.RenameTag):
                         ref.flags['rename'] = tag.name
                         ref.clear_cache()
@@ -440,15 +543,10 @@ class Parser:
                     elif isinstance(tag, (tags.ScopeTag, tags.DisplayTag)):
                         ref.flags[tag.type] = tag.name
                         ref.clear_cache()
-                    elif isinstance(tag, tags.TypeTag):
-                        ref.flags['type'] = tag.types
                     elif isinstance(tag, tags.OrderTag):
                         ref.flags['order'] = tag
                     elif isinstance(tag, tags.UnrecognizedTag):
                         log.warning('%s:%s: unrecognized tag @%s, ignoring', path, n, tag.name)
-                    elif not isinstance(tag, tags.SectionTag):
-                        unprocessed_tags.append(tag)
-                        ntags -= 1
                 if not ntags:
                     # This line doesn't contain a tag we handled.  It might contain
                     # content tags such as @tparam but we handle those during prerendering
@@ -468,25 +566,29 @@ class Parser:
                     #   3. if the next non-empty line of code doesn't contain '{' then
                     #      we'll assign upcoming fields to the parent instead of the table.
                     # These are tricky to avoid without fully tokenzing lua source.
-                    table_level += line.count('{')
-                    table_level -= line.count('}')
+                    #
+                    # Most lines have no braces at all, and a membership test is cheaper
+                    # than counting, so only count when there's something to count.
+                    if '{' in line or '}' in line:
+                        table_level += line.count('{') - line.count('}')
                     while isinstance(scopes[-1], TableRef) and \
                           table_level <= scopes[-1].level:
                         scopes.pop()
+                        scopes_snapshot = None
                         collection = scopes[-1]
 
                 if parse_next_code_line:
                     # If we're here, we have a non-comment and non-empty line.
-                    m = re_require.search(line)
+                    m = 'require' in line and self.RE_REQUIRE.search(line)
                     if m:
                         requires.append(m.group(1))
 
                     if ref is None:
                         continue
 
-                    for refcls in (FieldRef, FunctionRef):
-                        name, extra = getattr(self, '_parse_' + refcls.type)(line)
-                        scope = scopes[-1]
+                    scope = scopes[-1]
+                    for refcls, parse_code in code_parsers:
+                        name, extra = parse_code(line)
                         if refcls == FieldRef and isinstance(scope, ModuleRef) and scope.name == name:
                             # If we have a field that's the same name as the current
                             # module we don't register it, as this is a common pattern.
@@ -497,10 +599,12 @@ class Parser:
                                     '%s:%s: %s defined before %s %s has terminated; separate with a blank line',
                                     ref.file, ref.line, refcls.type, ref.type, ref.name
                                 )
+                            if scopes_snapshot is None:
+                                scopes_snapshot = tuple(scopes)
                             ref = refcls.clone_from(ref,
-                                # Create a shallow copy of current scopes so subsequent modifications
-                                # don't retroactively apply.
-                                file=path, line=n, scopes=scopes[:], symbol=name,
+                                # Use a shallow copy of current scopes so subsequent
+                                # modifications don't retroactively apply.
+                                file=path, line=n, scopes=scopes_snapshot, symbol=sys.intern(name),
                                 collection=collection, extra=extra
                             )
                             break
@@ -522,7 +626,7 @@ class Parser:
 
         if ref and self._check_disconnected_reference(ref):
             # if isinstance(ref, ModuleRef) and 
-            if not ref.userdata.get('added'):
+            if not ref._added:
                 # If we're here, ref is an explicitly defined collection (module, class,
                 # or section) that wasn't added, which must mean it doesn't contain
                 # anything other than the collection's own docstring.  Because it was
@@ -549,7 +653,6 @@ class Parser:
         Reference objects generated from headings are named such that the heading
         text is converted to lower case and all spaces converted to underscores.
         """
-        content = f.read()
         path = f.name if hasattr(f, 'name') else '<generated>'
 
         # Create the top-level reference for the manual page.  Any lines in the markdown
@@ -566,10 +669,18 @@ class Parser:
         symbols: dict[str, int] = {}
 
         ref = topref
+        # Most lines are appended to the current ref's content, so keep the bound method
+        # handy and rebind it only when the ref changes.
+        add_content = ref.raw_content.append
         codeblocks = 0
-        for n, line in enumerate(content.splitlines(), 1):
-            codeblocks += line.count('```')
-            m = self.RE_MANUAL_HEADING.search(line)
+        # Lines are read from the file as we go rather than reading the whole file and
+        # splitting it.
+        for n, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if '```' in line:
+                codeblocks += line.count('```')
+            # The heading regexp is anchored, so only lines starting with '#' can match.
+            m = line.startswith('#') and self.RE_MANUAL_HEADING.match(line)
             # If we have what looks to be a heading, make sure it's not actually contained
             # within a code block.
             if m and codeblocks % 2 == 0:
@@ -581,8 +692,8 @@ class Parser:
                         ref.heading = heading
 
                     # Symbol is used for URL fragment
-                    symbol = recache(r'[^a-zA-Z0-9- ]').sub('', heading.lower())
-                    symbol = recache(r' +').sub('_', symbol).replace('_-_', '-')
+                    symbol = self.RE_MANUAL_SYMBOL_INVALID.sub('', heading.lower())
+                    symbol = self.RE_MANUAL_SYMBOL_SPACES.sub('_', symbol).replace('_-_', '-')
                     # Headings don't need to be unique, so check for duplicate symbol
                     if symbol in symbols:
                         symbol = symbol + str(symbols[symbol] + 1)
@@ -594,21 +705,26 @@ class Parser:
 
                     if ref != topref:
                         self._add_reference(ref)
+                    add_content = ref.raw_content.append
                     # The Reference object captures the heading title which
                     # _render_manual() handles, so skip adding the heading line to the
                     # ref's content just below.
                     continue
 
-            ref.raw_content.append((n, line, None))
+            add_content((n, line, None))
 
 
     def get_reference(self, typ: Type[Reference], name: str) -> Union[Reference, None]:
         """
         Returns the Reference object for the given type and name.
         """
-        for ref in self.parsed[typ]:
-            if ref.name == name:
-                return ref
+        index = self._parsed_by_name.get(typ)
+        if index is None:
+            index = self._parsed_by_name[typ] = {}
+            for ref in self.parsed[typ]:
+                # First ref wins in case of duplicate names
+                index.setdefault(ref.name, ref)
+        return index.get(name)
 
 
     def resolve_ref(self, name: str) -> Union[Reference, None]:
@@ -620,14 +736,20 @@ class Parser:
 
         If the name can't be resolved then None is returned.
         """
-        name = name.replace(':', '.').replace('(', '').replace(')', '')
+        key = (id(self.ctx.ref), name)
+        try:
+            return self._resolve_cache[key]
+        except KeyError:
+            pass
+        name = name.translate(self.RESOLVE_NAME_TABLE)
         ref: Reference|None = None
         if self.ctx.ref:
             # Search the upward in the current context's scope for the given name.
             # ref's scopes may be None if it was an implicitly added module.
-            scopes = self.ctx.ref.scopes or []
-            for scope in [self.ctx.ref.name] + [r.name for r in scopes]:
-                ref = self.refs.get(scope + '.' + name)
+            # Names are looked up as we go, so we stop walking the scopes at the first
+            # hit without building a list of every scope's name up front.
+            for scope in (self.ctx.ref, *(self.ctx.ref.scopes or ())):
+                ref = self.refs.get(scope.name + '.' + name)
                 if ref:
                     break
         if not ref:
@@ -645,44 +767,53 @@ class Parser:
                     if ref:
                         break
 
-        if ref and ref.within and 'within_topsym' not in ref.userdata:
-            # Check to see if the @within section is in the same topsym.
-            collections = self.collections[ref.topsym]
-            if ref.within not in collections:
-                # This reference is @within another topsym.  We need to find it.
-                candidates: set[str] = set()
-                for topsym in self.topsyms:
-                    collections = self.collections[topsym]
-                    if ref.within in collections:
-                        candidates.add(topsym)
-                if len(candidates) > 1:
-                    log.error('%s is @within %s which is ambiguous (in %s)', name, ref.within, ', '.join(candidates))
-                else:
-                    # Remember that this ref is @within a different topsym
-                    ref.userdata['within_topsym'] = candidates.pop()
-            else:
-                # Remember that this ref is @within the same topsym
-                ref.userdata['within_topsym'] = ref.topsym
-
+        if ref and ref.within and not ref.within_topsym:
+            self._resolve_within(ref, name)
+        self._resolve_cache[key] = ref
         return ref
 
 
+    def _resolve_within(self, ref: Reference, name: str) -> None:
+        """
+        Determines which topsym contains the collection the given ref is @within, and
+        stores it in the ref's within_topsym attribute.
+        """
+        assert(ref.within)
+        # Check to see if the @within section is in the same topsym.
+        collections = self.collections[ref.topsym]
+        if ref.within not in collections:
+            # This reference is @within another topsym.  We need to find it.
+            candidates = set(self._collection_topsyms.get(ref.within, ()))
+            if len(candidates) > 1:
+                log.error('%s is @within %s which is ambiguous (in %s)', name, ref.within, ', '.join(candidates))
+            else:
+                # Remember that this ref is @within a different topsym
+                ref.within_topsym = candidates.pop()
+        else:
+            # Remember that this ref is @within the same topsym
+            ref.within_topsym = ref.topsym
+
+
     def _reorder_refs(self, refs: List[RefT], topref: Optional[Reference]=None) -> List[RefT]:
         """
         Reorders the given list of Reference objects according to any @order tags.
         """
-        # For @order first
-        first: list[RefT] = []
-        # For @order last
-        last: list[RefT] = []
-        # Everything else, which is ordered relative to other names
         ordered = refs[:]
+
+        def remove(ref: RefT) -> None:
+            # list.remove() tests with ==, which for our dataclasses compares every field
+            # of every element up to the match.  We only ever want the ref itself.
+            for n, other in enumerate(ordered):
+                if other is ref:
+                    del ordered[n]
+                    return
+
         for ref in refs:
-            if topref and topref != ref.topref:
+            if topref and ref.topref is not topref:
                 # Sanity checks that the topref for this section matches the topref
                 # we wanted collections from.  A mismatch means there is a name collision
                 # in which case _add_reference() would already have logged an error.
-                ordered.remove(ref)
+                remove(ref)
                 continue
             order: Optional[tags.OrderTag] = ref.flags.get('order')
             if not order:
@@ -690,26 +821,22 @@ class Parser:
             if not order.anchor:
                 # No anchor means only first or last is supported.
                 if order.whence == 'first':
-                    ordered.remove(ref)
+                    remove(ref)
                     ordered.insert(0, ref)
                 elif order.whence == 'last':
-                    ordered.remove(ref)
+                    remove(ref)
                     ordered.append(ref)
                 else:
                     log.error('%s:~%s @order %s requires an anchor reference', ref.file, ref.line, order.whence)
             else:
                 for n, other in enumerate(ordered):
                     if other.symbol == order.anchor:
-                        if order.whence == 'before':
-                            ordered.remove(ref)
-                            ordered.insert(n, ref)
-                        else:
-                            ordered.remove(ref)
-                            ordered.insert(n+1, ref)
+                        remove(ref)
+                        ordered.insert(n if order.whence == 'before' else n+1, ref)
                         break
                 else:
                     log.error('%s:~%s unknown @order anchor reference %s', ref.file, ref.line, order.anchor)
-        return first + ordered + last
+        return ordered
 
 
     def get_collections(self, topref: Reference) -> List[CollectionRef]:
@@ -720,6 +847,10 @@ class Parser:
         if topref.name not in self.collections:
             return []
         sections = self.collections[topref.name].values()
+        if not any('order' in ref.flags for ref in sections):
+            # Nothing to reorder (the common case), so only the topref sanity check
+            # from _reorder_refs() applies.
+            return [ref for ref in sections if ref.topref is topref]
         return self._reorder_refs(list(sections), topref)
 
 
@@ -732,11 +863,7 @@ class Parser:
         # @section names aren't necessarily globally unique, so determine which topsyms
         # contain a collection with the same name (which may or may not be the same topsym
         # for the given colref).
-        found: set[str] = set()
-        for col in self.collections.values():
-            for ref in col.values():
-                if ref.name == colref.name:
-                    found.add(ref.topsym)
+        found = set(self._collections_by_name.get(colref.name, ()))
 
         topsym = colref.topsym
         if len(found) <= 1:
@@ -753,21 +880,26 @@ class Parser:
                 colref.name, topsym, ', '.join(found), topsym, typ.type
             )
 
-        elems: list[RefT] = []
-        for ref in self.parsed[typ]:
-            if topsym and topsym != ref.topsym:
-                # We're constraining the refs search to the given topref but this ref
-                # doesn't belong to that topref.
-                continue
-            if ref.within:
-                if ref.within == colref.name:
-                    # @within for this ref targets this collection by name
-                    elems.append(ref)
-            elif ref.collection and ref.collection.name == colref.name:
-                # No @within, and either the candidate ref's collection name matches the
-                # given collection name.
-                elems.append(ref)
-        return self._reorder_refs(elems)
+        index = self._parsed_by_collection.get(typ)
+        if index is None:
+            # Group all refs of this type by the name of the collection they belong to,
+            # both within their topsym and across all topsyms, preserving the order they
+            # were parsed in.
+            index = self._parsed_by_collection[typ] = {}
+            for ref in self.parsed[typ]:
+                if ref.within:
+                    # @within for this ref targets the collection by name
+                    name = ref.within
+                else:
+                    # No @within, so use the name of the collection the ref was
+                    # declared in.
+                    name = ref.collection.name if ref.collection else None
+                index.setdefault((name, None), []).append(ref)
+                index.setdefault((name, ref.topsym), []).append(ref)
+
+        # If topsym is set, we're constraining the refs search to the given topref,
+        # otherwise refs from any topsym will do.
+        return self._reorder_refs(index.get((colref.name, topsym), []))
 
 
     def render_ref_markdown(self, ref: Reference, text: Optional[str]=None, code=False) -> str:
@@ -815,11 +947,17 @@ class Parser:
         # return block
         # self._xxx = getattr(self, '_xxx', 0) + len(block)
         # log.info('process 2: %s', self._xxx)
+        #
+        # Most blocks contain no references at all, so each pass is skipped unless its
+        # sigil appears in the block.
+        #
         # Resolve `ref`
-        block = recache(r'(?<!`)`([^` ]+)`', re.S).sub(self._render_backtick_ref_markdown_re, block)
+        if '`' in block:
+            block = self.RE_BACKTICK_REF.sub(self._render_backtick_ref_markdown_re, block)
         # Resolve @{ref} and @{ref|text}.  Do this *after* `ref` in case the ref is in the
         # form `@{stuff}`.
-        block = recache(r'(`)?@{([^}|]+)(?:\|([^}]*))?}(`)?', re.S).sub(self._render_ref_markdown_re, block)
+        if '@{' in block:
+            block = self.RE_REF.sub(self._render_ref_markdown_re, block)
         return block
 
 
@@ -838,7 +976,9 @@ class Parser:
         tags, a list of (types, docstrings) for @treturn tags, and a string holding the
         converted content to markdown.
         """
-        assert(self.ctx.file)
+        # Looked up once here as it's needed for every line below.
+        ctx = self.ctx
+        assert(ctx.file)
         params: dict[str, tuple[list[str], Content]] = {}
         returns: list[tuple[list[str], Content]] = []
         # These tags take nested content
@@ -846,26 +986,35 @@ class Parser:
 
         # We pass _refs_to_markdown() as a postprocessor for the Content (here as well as
         # below) which will resolve all references when the renderer finally fetches the
-        # markdown content via the Markdown.get() method.
-        #
+        # markdown content via the Markdown.get() method.  The bound method is created
+        # once and shared by all Content objects for this block.
+        refs_to_markdown = self.refs_to_markdown
+
         # List of (indent, tag, content)
         stack: list[tuple[int, tags.Tag|None,  Content]] = [
             # Initialize to the top-level Content object
-            (0, None, Content(postprocess=self.refs_to_markdown))
+            (0, None, Content(postprocess=refs_to_markdown))
         ]
         # The number of columns to dedent raw lines before adding to the parsed content.
         # If None, we set this to the current line's indent level and use that as dedent
         # until reset back to None.
         dedent = None
+        # The Markdown fragment plain lines are currently appended to.  Runs of plain
+        # lines go to the same fragment, so it's only looked up again (via md()) after
+        # the stack or the top content changes.
+        md: Markdown|None = None
+        # Bound once here as it may be called for every line below.
+        parse_tags = self.tag_parser.parse
         # We tack on a sentinel value at the end of the raw lines which forces closure of
         # all pending tags on the stack.
         for n, line, taglist in lines + [(-1, '', None)]:
-            self.ctx.update(line=n)
+            # Only the line changes, so skip the generality of ctx.update().
+            ctx.line = n
             if taglist is None:
                 # If taglist is None then we know we're parsing a manual page where we
                 # support tags without comment blocks.  Pass False to TagParser.parse()
                 # so it knows it shouldn't require a comment prefix for tag detection.
-                taglist = list(self.tag_parser.parse(line, self.ctx.file, n, False))
+                taglist = list(parse_tags(line, ctx.file, n, False))
             else:
                 # We're processing content from a code block (because taglist isn't None),
                 # so strip the preceding comment markers before processing the content.
@@ -875,8 +1024,9 @@ class Parser:
             assert len(taglist) <= 1, 'multiple content tags per line NYI'
             tag = taglist[0] if taglist else None
             # Now that comment prefixes have been stripped (if applicable), grab the
-            # current indent level which is used for detecting nested tags.
-            indent = get_indent_level(line)
+            # current indent level which is used for detecting nested tags.  (This is
+            # get_indent_level() inlined.)
+            indent = len(line) - len(line.lstrip(' '))
 
             while len(stack) > 1 and (line or n == -1):
                 if stack[-1][0] < indent:
@@ -888,15 +1038,17 @@ class Parser:
                     content.md().rstrip().append('```\n')
                 # Redetect dedent level based on next line.
                 dedent = None
+                md = None
 
             # New content fragments are appended to the content object from the top of the
             # stack.
             content = stack[-1][2]
             if tag:
+                md = None
                 # The Content object this tag's content will be pushed to.  For tags that
                 # take content we initialize a new Content object, otherwise we just reuse
                 # the last one on the stack and append to it.
-                tagcontent = Content(postprocess=self.refs_to_markdown) if isinstance(tag,  content_tags) else stack[-1][2]
+                tagcontent = Content(postprocess=refs_to_markdown) if isinstance(tag,  content_tags) else stack[-1][2]
                 stack.append((indent, tag, tagcontent))
 
                 if isinstance(tag, tags.CodeTag):
@@ -909,13 +1061,15 @@ class Parser:
                     # block
                     dedent = None
                 elif isinstance(tag, tags.AdmonitionTag):
-                    heading = self.refs_to_markdown(tag.title or tag.type.title())
+                    heading = refs_to_markdown(tag.title or tag.type.title())
                     content.append(Admonition(tag.type, heading, tagcontent))
                     dedent = None
                 elif isinstance(tag, tags.ParamTag):
                     if tag.desc:
                         tagcontent.md().append(tag.desc)
-                    params[tag.name] = tag.types, tagcontent
+                    # Interned to match the (interned) argument names parsed from
+                    # code, which are what the prerenderer looks these up by.
+                    params[sys.intern(tag.name)] = tag.types, tagcontent
                 elif isinstance(tag, tags.ReturnTag):
                     if tag.desc:
                         tagcontent.md().append(tag.desc)
@@ -928,7 +1082,9 @@ class Parser:
 
             elif line is not None:
                 dedent = indent if dedent is None else dedent
-                content.md().append(line[dedent:])
+                if md is None:
+                    md = content.md()
+                md.append(line[dedent:])
 
         if len(stack) != 1:
             log.error('%s:~%s: LuaDox bug: @%s is dangling', self.ctx.file, lines[-1][0], stack[-1][1])
@@ -14,6 +14,7 @@
 
 __all__ = ['Prerenderer']
 
+from operator import attrgetter
 from typing import Union, Tuple, List
 
 from .log import log
@@ -47,7 +48,7 @@ class Prerenderer:
             elif isinstance(ref, ManualRef):
                 self._do_manual(ref)
             toprefs.append(ref)
-        toprefs.sort(key=lambda ref: (ref.type, ref.symbol))
+        toprefs.sort(key=attrgetter('type', 'symbol'))
         return toprefs
 
 
@@ -73,15 +74,17 @@ class Prerenderer:
             fields = list(self.parser.get_elements_in_collection(FieldRef, colref))
             has_content = has_content or colref.content or functions or fields
 
-            colref.compact = colref.flags.get('compact', [])
-            fullnames: bool = colref.flags.get('fullnames', False)
+            flags = colref.flags
+            colref.compact = flags.get('compact', [])
+            fullnames: bool = flags.get('fullnames', False)
 
             for ref in fields:
                 self.ctx.update(ref=ref)
                 _, _, content = self.parser.parse_raw_content(ref.raw_content)
-                ref.title = ref.flags.get('display') or (ref.name if fullnames else ref.symbol)
-                ref.types = ref.flags.get('type', [])
-                ref.meta = ref.flags.get('meta')
+                flags = ref.flags
+                ref.title = flags.get('display') or (ref.name if fullnames else ref.symbol)
+                ref.types = flags.get('type', [])
+                ref.meta = flags.get('meta')
                 ref.content = content
                 colref.fields.append(ref)
 
@@ -96,9 +99,12 @@ class Prerenderer:
                 # ref.extra contains the list of parameter names as parsed from the
                 # source.  Construct the params list based on 
                 for param in ref.extra:
-                    try:
-                        params.append((param, *paramsdict[param]))
-                    except KeyError:
+                    # Undocumented arguments are common, so test rather than catching
+                    # KeyError.
+                    documented = paramsdict.get(param)
+                    if documented:
+                        params.append((param, *documented))
+                    else:
                         params.append((param, [], Content()))
                         if paramsdict:
                             log.warning('%s:%s: %s() missing @tparam for "%s" parameter', ref.file, ref.line, ref.name, param)
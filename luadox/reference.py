@@ -19,17 +19,30 @@ __all__ = [
 ]
 
 import hashlib
-import re
+import sys
 from dataclasses import dataclass, field, fields
-from typing import TypeVar, Optional, Union, List, Tuple, Dict, Any
+from typing import TypeVar, Optional, Union, List, Tuple, Dict, FrozenSet, Sequence, Any
 
 from .log import log
 from .tags import Tag
-from .utils import Content
+from .utils import Content, cached_property
 
 # Used for generics taking Reference types
 RefT = TypeVar('RefT', bound='Reference')
 RawContentType =  List[Tuple[int, str, Union[List[Tag], None]]]
+# Caches the dataclass field names of each Reference class for clone_from(), which is
+# called for every typed ref the parser creates.
+FIELD_NAMES: Dict[type, FrozenSet[str]] = {}
+
+def split_symbol(symbol: str) -> Tuple[str, str]:
+    """
+    Splits the given symbol at its last '.' or ':' delimiter, returning the 2-tuple
+    (prefix, name) where prefix retains the trailing delimiter.  If there is no
+    delimiter, prefix is the empty string.
+    """
+    n = max(symbol.rfind('.'), symbol.rfind(':')) + 1
+    return symbol[:n], symbol[n:]
+
 
 @dataclass
 class Reference:
@@ -84,20 +97,23 @@ class Reference:
     line: Optional[int] = None
     # A stack of Reference objects this ref is contained within. Used to resolve names by
     # crawling up the scope stack.
-    scopes: Optional[List['Reference']] = None
+    scopes: Optional[Sequence['Reference']] = None
     # Name of symbol for @within
     within: Optional[str] = None
+    # The topsym containing the collection named by @within, which is resolved lazily
+    # by the parser and may differ from our own topsym.
+    within_topsym: Optional[str] = None
     # The collection the ref belongs to
     collection: Optional['Reference'] = None
 
     # A dict that can be used from the outside to store some external metadata
-    # about the Reference.  For example, Parser._add_reference() uses it to
-    # determine of the ref had already been added, and the pre-render stage uses
-    # it to store a flag as to whether the ref has any renderable content.
+    # about the Reference.  For example, the pre-render stage uses it to store a
+    # flag as to whether the ref has any renderable content.
     userdata: Dict[str, Any] = field(default_factory=dict)
     # Contextual information depending on type (e.g. for functions it's information
-    # about arguments).
-    extra: List[str] = field(default_factory=list)
+    # about arguments).  Only some types have this, and it's replaced rather than
+    # modified, so an empty tuple saves allocating a list for every other ref.
+    extra: Sequence[str] = ()
     # A list of lines containing the documented content for this collection.  Each element
     # is a 2-tuple in the form (line number, text) where line number is the specific line
     # in self.file where the comment appears, and text is in markdown format.
@@ -120,7 +136,9 @@ class Reference:
         subclass) from an untyped reference (Reference instance).
         """
         # We must only clone fields that are allowed by the target class.
-        allowed = {f.name for f in fields(cls)}
+        allowed = FIELD_NAMES.get(cls)
+        if allowed is None:
+            allowed = FIELD_NAMES[cls] = frozenset(f.name for f in fields(cls))
         args = {
             k: v for k, v in ref.__dict__.items() 
                  if k in allowed and k[0] != '_' and k != 'type'
@@ -138,6 +156,9 @@ class Reference:
         self._topsym: str|None = None
         # Display name of the Reference name (cached from _set_name())
         self._display: str|None = None
+        # True once Parser._add_reference() has registered us.  This is checked for
+        # every parsed ref, so it's a plain attribute rather than a userdata key.
+        self._added: bool = False
 
     def __str__(self) -> str:
         return '{}(type={}, _name={}, symbol={}, file={}, line={} impl={})'.format(
@@ -150,6 +171,9 @@ class Reference:
         self._symbol = None
         self._topsym = None
         self._display = None
+        # Values of the cached properties live in the instance dict
+        for attr in ('name', 'display', 'topsym', 'topref', 'display_compact', 'hierarchy'):
+            self.__dict__.pop(attr, None)
 
     @property
     def scope(self) -> Union['Reference', None]:
@@ -166,15 +190,18 @@ class Reference:
         """
         return self.scopes[-1] if self.scopes else None
 
-    @property
+    @cached_property
     def name(self) -> str:
         """
         The fully qualified proper name by which this Reference can be linked.  The
         name is not necessarily globally unique, but *is* unique within its topref.
         """
-        if not self._name:
-            self._set_name()
-            assert(self._name)
+        # name, display, and topsym are read far more often than they're computed, so
+        # they're cached properties: once set, reads are plain instance dict lookups.
+        # _set_name() derives both name and display, so cache both here.
+        self._set_name()
+        assert(self._name)
+        self.__dict__['display'] = self._display
         return self._name
 
     @property
@@ -189,19 +216,18 @@ class Reference:
         s = f'{self.topref.type}#{self.topsym}#{self.name}'
         return hashlib.blake2b(s.encode(), digest_size=20).hexdigest()
 
-    @property
+    @cached_property
     def topsym(self) -> str:
         """
         Returns the symbol name of our top-level reference.
 
         This does *not* honor @within.
         """
-        if not self._topsym:
-            self._set_topsym()
-            assert(self._topsym)
+        self._set_topsym()
+        assert(self._topsym)
         return self._topsym
 
-    @property
+    @cached_property
     def topref(self) -> 'Reference':
         """
         Returns the Reference object for the top-level reference this ref
@@ -213,14 +239,14 @@ class Reference:
         # If there are no scopes, we *are* the topref
         return self if not self.scopes else self.parser_refs[self.topsym]
 
-    @property
+    @cached_property
     def display(self) -> str:
-        if not self._display:
-            self._set_name()
-            assert(self._display is not None)
+        self._set_name()
+        assert(self._display is not None)
+        self.__dict__['name'] = self._name
         return self._display
 
-    @property
+    @cached_property
     def display_compact(self) -> str:
         """
         Compact form of display name (topsym stripped)
@@ -229,31 +255,36 @@ class Reference:
         if display:
             return display
         else:
-            assert(isinstance(self.symbol, str))
-            assert(isinstance(self.topsym, str))
-            if self.symbol.startswith(self.topsym):
-                return self.symbol[len(self.topsym):].lstrip(':.')
+            # topsym is only needed (and so only computed) without @display.
+            symbol = self.symbol
+            topsym = self.topsym
+            assert(isinstance(symbol, str))
+            assert(isinstance(topsym, str))
+            if symbol.startswith(topsym):
+                return symbol[len(topsym):].lstrip(':.')
             else:
-                return self.symbol
+                return symbol
 
     def _apply_rename(self) -> None:
         """
         Applies a @rename tag to the symbol attribute.
         """
         assert(self.symbol)
+        # The symbol may change from here on, which display_compact derives from.
+        self.__dict__.pop('display_compact', None)
+        # Most refs aren't @rename'd, so there's nothing more to do for them.
+        rename_tag: str|None = self.flags.get('rename')
+        if not rename_tag:
+            return
         if not self._symbol:
-            # Retain original symbol in case rename is specified
+            # Retain original symbol, which a non-qualified rename is relative to
             self._symbol = self.symbol
-
-        # If we were @rename'd
-        rename_tag: str|None = self.flags.get('rename')
-        if rename_tag:
-            if '.' in rename_tag:
-                # Fully qualified name provided, take it as-is
-                self.symbol = rename_tag
-            else:
-                # Non-qualified name provided, take it as relative to the current symbol
-                self.symbol = ''.join(re.split(r'([.:])', self._symbol)[:-1]) + rename_tag
+        if '.' in rename_tag:
+            # Fully qualified name provided, take it as-is
+            self.symbol = rename_tag
+        else:
+            # Non-qualified name provided, take it as relative to the current symbol
+            self.symbol = sys.intern(split_symbol(self._symbol)[0] + rename_tag)
 
 
     def _set_name(self) -> None:
@@ -264,7 +295,9 @@ class Reference:
         anchors within a given page, and each top-level ref gets its own page.
         """
         self._apply_rename()
-        self._name = self.symbol
+        # Interned as with FieldRef names.  This also covers topsyms, which are the
+        # names of toprefs.
+        self._name = sys.intern(self.symbol)
         self._display = self.flags.get('display') or self.symbol
 
 
@@ -313,13 +346,14 @@ class FieldRef(Reference):
         attributes), these will be qualified based on the class name.
         """
         # Field types must have a scope
-        assert(self.scopes and self.scope)
+        scope = self.scope
+        assert(self.scopes and scope)
 
         self._apply_rename()
 
         # Heuristic: if scope is a class and this field is under a static table, then
         # we consider it a metaclass static field and remove the 'static' part.
-        if isinstance(self.scope, ClassRef) and '.static.' in self.symbol:
+        if isinstance(scope, ClassRef) and '.static.' in self.symbol:
             self.symbol = self.symbol.replace('.static', '')
 
         # The display name for this ref, initialized to the @display tag value if provided
@@ -337,22 +371,24 @@ class FieldRef(Reference):
         if scope_tag:
             # @scope tag was given. Take the tail end of the symbol as we're going to
             # requalify it under the @scope value.
-            symbol: str = re.split(r'[.:]', self.symbol)[-1]
+            symbol: str = split_symbol(name)[1]
             if scope_tag != '.':
                 # Non-global scope.  Determine what delimiter we should use based on the
                 # original symbol.
-                delim = ':' if ':' in self.symbol else '.'
+                delim = ':' if ':' in name else '.'
                 symbol = f'{scope_tag}{delim}{symbol}'
             self.symbol = symbol
             name = symbol
             display = display or symbol
-        elif '.' not in self.symbol:
+        elif '.' not in name:
             # No @scope given, but we need to qualify the name based on the (unqualified)
             # symbol and scope.
-            name = f'{self.scope.symbol}.{self.symbol}'
+            name = f'{scope.symbol}.{name}'
             display = display or name
 
-        self._name = name.replace(':', '.')
+        # Names are used as keys for the parser's indexes and are looked up repeatedly
+        # during prerendering and rendering, so intern them.
+        self._name = sys.intern(name.replace(':', '.'))
         self._display = display or self.symbol
 
 
@@ -406,15 +442,20 @@ class ModuleRef(TopRef):
 class ClassRef(TopRef):
     type: str = 'class'
 
-    @property
+    @cached_property
     def hierarchy(self) -> List['Reference']:
+        # This is only needed once all parsing is done (when resolving references and
+        # rendering), at which point all superclasses are known, so it's computed once.
+        # Walk up from this class and reverse at the end, rather than inserting each
+        # superclass at the front.
         clsrefs: list[Reference] = [self]
-        while clsrefs[0].flags.get('inherits'):
-            superclass = self.parser_refs.get(clsrefs[0].flags['inherits'])
+        while clsrefs[-1].flags.get('inherits'):
+            superclass = self.parser_refs.get(clsrefs[-1].flags['inherits'])
             if not superclass:
                 break
             else:
-                clsrefs.insert(0, superclass)
+                clsrefs.append(superclass)
+        clsrefs.reverse()
         return clsrefs
 
 
@@ -434,7 +475,7 @@ class SectionRef(CollectionRef):
         """
         if isinstance(self.scope, ManualRef):
             # We are a section within a manual
-            self._name = '{}.{}'.format(self.scope.symbol, self.symbol)
+            self._name = sys.intern(f'{self.scope.symbol}.{self.symbol}')
             self._display = self.flags.get('display') or self.symbol
         else:
             super()._set_name()
@@ -46,6 +46,29 @@ ASSETS = [
     'img/i-bitbucket.svg',
 ]
 
+# Substitutions applied in order by HTMLRenderer._markdown_to_text() to reduce markdown
+# to plain text.
+MARKDOWN_TO_TEXT = [
+    # Code blocks
+    (re.compile(r'```.*?```', re.S), ''),
+    # Inline preformatted code
+    (re.compile(r'`([^`]+)`'), '\\1'),
+    # Headings
+    (re.compile(r'#+'), ''),
+    # Bold
+    (re.compile(r'\*([^*]+)\*'), '\\1'),
+    # Link or inline image
+    (re.compile(r'!?\[([^]]*)\]\([^)]+\)'), '\\1'),
+
+    # Clean up non-markdown things.
+    # Reference with custom display
+    (re.compile(r'@{[^|]+\|([^}]+)\}'), '\\1'),
+    # Just a reference
+    (re.compile(r'@{([^}]+)\}'), '\\1'),
+    # Consolidate multiple whitespaces
+    (re.compile(r'\s+'), ' '),
+]
+
 # Effectively disable implicit code blocks
 commonmark.blocks.CODE_INDENT = 1000
 
@@ -122,7 +145,7 @@ class HTMLRenderer(Renderer):
         Returns (html file name, URL fragment) of the given Reference object.
         """
         # The top-level Reference object that holds this reference, which respects @within.
-        topsym: str = ref.userdata.get('within_topsym') or ref.topsym
+        topsym: str = ref.within_topsym or ref.topsym
         try:
             topref = self.parser.refs[topsym]
         except KeyError:
@@ -183,24 +206,9 @@ class HTMLRenderer(Renderer):
         """
         Strips markdown codes from the given Markdown and returns the result.
         """
-        # Code blocks
-        text = recache(r'```.*?```', re.S).sub('', md)
-        # Inline preformatted code
-        text = recache(r'`([^`]+)`').sub('\\1', text)
-        # Headings
-        text = recache(r'#+').sub('', text)
-        # Bold
-        text = recache(r'\*([^*]+)\*').sub('\\1', text)
-        # Link or inline image
-        text = recache(r'!?\[([^]]*)\]\([^)]+\)').sub('\\1', text)
-
-        # Clean up non-markdown things.
-        # Reference with custom display
-        text = recache(r'@{[^|]+\|([^}]+)\}').sub('\\1', text)
-        # Just a reference
-        text = recache(r'@{([^}]+)\}').sub('\\1', text)
-        # Consolidate multiple whitespaces
-        text = recache(r'\s+').sub(' ', text)
+        text = md
+        for pattern, repl in MARKDOWN_TO_TEXT:
+            text = pattern.sub(repl, text)
         return text
 
     def _content_to_text(self, content: Content) -> str:
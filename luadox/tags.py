@@ -277,6 +277,9 @@ class TagParser:
         Looks for a @tag in the given raw line of code, and returns the appropriate
         tag object if found, or None otherwise.
         """
+        if '@' not in line:
+            # Most lines are prose and can't contain a tag.  Don't bother the regexp.
+            return
         m = (self.RE_COMMENTED_TAG if require_comment else self.RE_TAG).search(line)
         if not m:
             return
@@ -288,7 +291,8 @@ class TagParser:
             yield UnrecognizedTag(tag)
             return
 
-        args = [arg.strip() for arg in args.split()]
+        # split() with no separator already discards surrounding whitespace.
+        args = args.split()
         try:
             kwargs, consumed = self._coerce_args(args, argtypes)
             if len(args) > consumed:
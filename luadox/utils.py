@@ -14,7 +14,8 @@
 
 __all__ = [
     'Sentinel', 'Content', 'ContentFragment', 'Markdown', 'Admonition', 'SeeAlso',
-    'recache', 'get_first_sentence', 'get_indent_level', 'strip_trailing_comment',
+    'cached_property', 'recache', 'get_first_sentence', 'get_indent_level',
+    'strip_trailing_comment',
 ]
 
 import enum
@@ -22,7 +23,7 @@ import re
 import string
 from dataclasses import dataclass
 from functools import lru_cache
-from typing import Tuple, List, Callable, Optional, Pattern
+from typing import Tuple, List, Callable, Optional, Pattern, TypeVar, Generic, Union, Any, overload
 
 # Common abbreviations with periods that are considered when determining what is the
 # first sentence of a markdown block.
@@ -34,10 +35,14 @@ ABBREV = {
 # Used for detecting word boundaries. Anything *not* in this set can be considered as a
 # word boundary.
 WORD_CHARS = set(string.ascii_lowercase)
+# Matches a trailing Lua comment on a line of code.
+RE_TRAILING_COMMENT = re.compile(r'--.*')
 
 # Callback type used by content objects for postprocessing finalized content. Used for
 # converting refs to markdown links.
 PostProcessFunc = Optional[Callable[[str], str]]
+# Value type of a cached_property
+T = TypeVar('T')
 
 class ContentFragment:
     """
@@ -70,7 +75,15 @@ class Markdown(ContentFragment):
         """
         Removes trailing whitespace from the current set of lines added by append().
         """
-        self._lines = ['\n'.join(self._lines).rstrip()]
+        # Equivalent to joining all lines and stripping the result, but only touches the
+        # trailing lines rather than rebuilding the whole string.
+        lines = self._lines
+        while lines and not lines[-1].strip():
+            lines.pop()
+        if lines:
+            lines[-1] = lines[-1].rstrip()
+        else:
+            lines.append('')
         return self
 
     def get(self) -> str:
@@ -160,6 +173,37 @@ class Sentinel(enum.Enum):
     UNDEF = object()
 
 
+class cached_property(Generic[T]):
+    """
+    Minimal version of functools.cached_property.
+
+    The computed value is stored in the instance dict under the same name, which then
+    shadows the descriptor for subsequent lookups.  Deleting it from the instance dict
+    causes the value to be recomputed on next access.
+
+    Unlike functools.cached_property prior to Python 3.12, this doesn't take a lock on
+    first access, which we don't need as LuaDox is single-threaded.
+    """
+    def __init__(self, func: Callable[[Any], T]):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+    @overload
+    def __get__(self, instance: None, owner: Optional[type]=None) -> 'cached_property[T]': ...
+    @overload
+    def __get__(self, instance: object, owner: Optional[type]=None) -> T: ...
+
+    def __get__(self, instance: Optional[object], owner: Optional[type]=None) -> Union['cached_property[T]', T]:
+        if instance is None:
+            return self
+        value = instance.__dict__[self.name] = self.func(instance)
+        return value
+
+
 @lru_cache(maxsize=None)
 def recache(pattern: str, flags: int = 0) -> Pattern[str]:
     """
@@ -212,10 +256,10 @@ def get_indent_level(s: str) -> int:
     """
     Returns the number of spaces on left side of the string.
     """
-    m = recache(r'^( *)').search(s)
-    return len(m.group(1)) if m else 0
+    return len(s) - len(s.lstrip(' '))
 
 
 def strip_trailing_comment(line: str) -> str:
-    return recache(r'--.*').sub('', line)
+    # Most lines of code have no comment, so avoid the regexp when there can't be one.
+    return RE_TRAILING_COMMENT.sub('', line) if '--' in line else line
 